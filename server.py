@@ -1,8 +1,11 @@
 import logging
-from typing import List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 from mcp.server.fastmcp import FastMCP
-from openstack import connection
+from openstack import connection, exceptions
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -11,6 +14,18 @@ mcp = FastMCP("openstack-mcp-server")
 
 conn: Optional[connection.Connection] = None
 
+# Seconds between background rebuilds of the capacity snapshot.
+CAPACITY_REFRESH_INTERVAL = 60.0
+
+# Upper bound for the refresh interval while background rebuilds keep failing.
+CAPACITY_REFRESH_MAX_INTERVAL = 900.0
+
+# Threads used to fetch hypervisors, zones, flavors, limits and Placement data.
+CAPACITY_FETCH_WORKERS = 8
+
+# Placement resource classes and the capacity field prefix each one is rolled up into.
+CAPACITY_RESOURCE_CLASSES = {"VCPU": "vcpus", "MEMORY_MB": "ram_mb", "DISK_GB": "disk_gb"}
+
 
 class Server(BaseModel):
     """OpenStack server model."""
@@ -31,6 +46,97 @@ class ServerList(BaseModel):
     servers: List[Server]
 
 
+class Capacity(BaseModel):
+    """Schedulable compute resources as Placement sees them.
+
+    Totals are (total - reserved) * allocation_ratio, so they include overcommit.
+    Free values are never negative.
+    """
+
+    vcpus_total: int = 0
+    vcpus_used: int = 0
+    vcpus_free: int = 0
+    ram_mb_total: int = 0
+    ram_mb_used: int = 0
+    ram_mb_free: int = 0
+    disk_gb_total: int = 0
+    disk_gb_used: int = 0
+    disk_gb_free: int = 0
+
+
+class HostCapacity(Capacity):
+    """Compute resources of a single hypervisor host."""
+
+    host: str
+    availability_zone: Optional[str] = None
+    status: Optional[str] = None
+    state: Optional[str] = None
+    vcpus_max_unit: Optional[int] = None
+    ram_mb_max_unit: Optional[int] = None
+    disk_gb_max_unit: Optional[int] = None
+
+
+class ZoneCapacity(Capacity):
+    """Compute resources aggregated over an availability zone.
+
+    Resource sums only include schedulable hosts (enabled and up); hosts counts every host
+    and schedulable_hosts the ones included. name is None for hosts outside any zone.
+    """
+
+    name: Optional[str] = None
+    hosts: int = 0
+    schedulable_hosts: int = 0
+
+
+class FlavorFit(BaseModel):
+    """How many more instances of a flavor fit into the cloud."""
+
+    id: str
+    name: str
+    vcpus: int
+    ram_mb: int
+    disk_gb: int
+    ephemeral_gb: int = 0
+    swap_mb: int = 0
+    fits_total: int
+    fits_by_zone: Dict[str, int]
+    quota_allows: Optional[int] = None
+
+
+class QuotaUsage(BaseModel):
+    """Usage of a single compute quota of the current project."""
+
+    resource: str
+    limit: Optional[int] = None
+    in_use: int = 0
+    free: Optional[int] = None
+
+
+class QuotaUsageList(BaseModel):
+    """Compute quota usage of the current project."""
+
+    quotas: List[QuotaUsage]
+    refreshed_at: str
+
+
+class CapacitySummary(BaseModel):
+    """Capacity rollups per availability zone, host and flavor."""
+
+    zones: List[ZoneCapacity]
+    hosts: List[HostCapacity]
+    flavors: List[FlavorFit]
+    quotas: Optional[List[QuotaUsage]] = None
+    refreshed_at: str
+
+
+_capacity_cache: Optional[CapacitySummary] = None
+_capacity_lock = threading.Lock()
+_capacity_build_lock = threading.Lock()
+_capacity_timer: Optional[threading.Timer] = None
+# Bumped on every stop so refreshes started before it neither swap in nor reschedule.
+_capacity_generation = 0
+
+
 class OpenStackMCPServer:
     def __init__(
         self,
@@ -66,6 +172,7 @@ class OpenStackMCPServer:
                     "project_name": self.project_name,
                 },
             )
+            stop_capacity_refresh()
             logger.info("Successfully connected to OpenStack")
         except Exception as e:
             logger.error(f"Failed to connect to OpenStack: {e}")
@@ -136,3 +243,336 @@ def get_server(server_id: str) -> Server:
     except Exception as e:
         logger.error(f"Failed to get server {server_id}: {e}")
         raise
+
+
+def stop_capacity_refresh() -> None:
+    """Stop the background capacity refresh and drop the cached snapshot."""
+    global _capacity_cache, _capacity_timer, _capacity_generation
+    with _capacity_lock:
+        _capacity_generation += 1
+        if _capacity_timer:
+            _capacity_timer.cancel()
+        _capacity_timer = None
+        _capacity_cache = None
+
+
+def _schedule_capacity_refresh(generation: int, failures: int = 0) -> None:
+    """Schedule the next background refresh, backing off after failures.
+
+    Nothing is scheduled if the refresh was stopped meanwhile.
+    """
+    global _capacity_timer
+    delay = min(CAPACITY_REFRESH_INTERVAL * 2**failures, CAPACITY_REFRESH_MAX_INTERVAL)
+    with _capacity_lock:
+        if generation != _capacity_generation:
+            return
+        _capacity_timer = threading.Timer(delay, _run_capacity_refresh, args=(generation, failures))
+        _capacity_timer.daemon = True
+        _capacity_timer.start()
+
+
+def _run_capacity_refresh(generation: int, failures: int) -> None:
+    """Refresh the capacity snapshot in the background and schedule the next refresh.
+
+    On failure the previous snapshot is kept and the interval backs off. A permission error
+    stops the refresh and drops the snapshot so the next call reports the error.
+    """
+    global _capacity_cache, _capacity_timer
+    try:
+        with _capacity_build_lock:
+            _refresh_capacity_cache(generation)
+    except exceptions.ForbiddenException as e:
+        logger.error(f"Stopping capacity refresh, permission denied: {e}")
+        with _capacity_lock:
+            if generation == _capacity_generation:
+                _capacity_timer = None
+                _capacity_cache = None
+        return
+    except Exception as e:
+        logger.error(f"Failed to refresh capacity snapshot: {e}")
+        _schedule_capacity_refresh(generation, failures + 1)
+        return
+
+    _schedule_capacity_refresh(generation)
+
+
+def _refresh_capacity_cache(generation: int) -> CapacitySummary:
+    """Build a new capacity snapshot and swap it in unless the refresh was stopped meanwhile.
+
+    Callers hold _capacity_build_lock; readers are only blocked for the swap.
+    """
+    global _capacity_cache
+    snapshot = _build_capacity_snapshot()
+    with _capacity_lock:
+        if generation == _capacity_generation:
+            _capacity_cache = snapshot
+    return snapshot
+
+
+def _get_capacity_snapshot() -> CapacitySummary:
+    """Return the cached capacity snapshot.
+
+    The first call builds it and starts the background refresh, so nothing runs in the
+    background until the capacity tools are used.
+    """
+    with _capacity_lock:
+        snapshot = _capacity_cache
+    if snapshot is not None:
+        return snapshot
+
+    with _capacity_build_lock:
+        with _capacity_lock:
+            snapshot = _capacity_cache
+            generation = _capacity_generation
+        if snapshot is None:
+            snapshot = _refresh_capacity_cache(generation)
+            _schedule_capacity_refresh(generation)
+    return snapshot
+
+
+def _provider_resources(provider_id: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Fetch inventories and usages of a Placement resource provider."""
+    provider_inventories = conn.placement.resource_provider_inventories(provider_id)
+    inventories = {inventory.resource_class: inventory for inventory in provider_inventories}
+    usages = conn.placement.fetch_resource_provider_usages(provider_id).usages or {}
+    return inventories, usages
+
+
+def _build_capacity_snapshot() -> CapacitySummary:
+    """Fetch hypervisors, zones, flavors, limits and Placement data concurrently and roll them up.
+
+    Resource figures come from Placement because the hypervisor API dropped them in
+    microversion 2.88. Since 2.53 a hypervisor id is the UUID of its resource provider.
+    Quotas are optional here: if the limits cannot be fetched, quotas is None.
+    """
+    with ThreadPoolExecutor(max_workers=CAPACITY_FETCH_WORKERS) as executor:
+        hypervisors_future = executor.submit(lambda: list(conn.compute.hypervisors(details=True)))
+        zones_future = executor.submit(lambda: list(conn.compute.availability_zones(details=True)))
+        flavors_future = executor.submit(lambda: list(conn.compute.flavors()))
+        limits_future = executor.submit(conn.compute.get_limits)
+
+        hypervisors = hypervisors_future.result()
+        resource_futures = [executor.submit(_provider_resources, hv.id) for hv in hypervisors]
+
+        zones = zones_future.result()
+        flavors = flavors_future.result()
+        resources = [future.result() for future in resource_futures]
+
+        quotas: Optional[List[QuotaUsage]] = None
+        try:
+            quotas = _quota_usage(limits_future.result().absolute)
+        except Exception as e:
+            logger.warning(f"Failed to get compute limits for capacity summary: {e}")
+
+    # Only compute services place a host in a zone; the "internal" zone lists the
+    # controller services, which may run on the same host.
+    host_zones: Dict[str, str] = {}
+    for zone in zones:
+        for host, services in (zone.hosts or {}).items():
+            if "nova-compute" in (services or {}):
+                host_zones[host] = zone.name
+
+    hosts = [
+        _host_capacity(hypervisor, inventories, usages, host_zones)
+        for hypervisor, (inventories, usages) in zip(hypervisors, resources)
+    ]
+
+    return CapacitySummary(
+        zones=_zone_capacities(hosts),
+        hosts=hosts,
+        flavors=[_flavor_fit(flavor, hosts, quotas) for flavor in flavors],
+        quotas=quotas,
+        refreshed_at=datetime.now(timezone.utc).isoformat(),
+    )
+
+
+def _host_capacity(
+    hypervisor, inventories: Dict[str, Any], usages: Dict[str, int], host_zones: Dict[str, str]
+) -> HostCapacity:
+    """Build the schedulable capacity of a hypervisor from its Placement inventories and usages.
+
+    Resource classes missing from the inventory (e.g. on Ironic nodes) count as no capacity.
+    """
+    service_host = (hypervisor.service_details or {}).get("host") or hypervisor.name
+    fields: Dict[str, Any] = {}
+    for resource_class, prefix in CAPACITY_RESOURCE_CLASSES.items():
+        inventory = inventories.get(resource_class)
+        if inventory is None:
+            continue
+
+        total = int((inventory.total - inventory.reserved) * inventory.allocation_ratio)
+        used = usages.get(resource_class, 0)
+        fields[f"{prefix}_total"] = total
+        fields[f"{prefix}_used"] = used
+        fields[f"{prefix}_free"] = max(total - used, 0)
+        fields[f"{prefix}_max_unit"] = inventory.max_unit
+
+    return HostCapacity(
+        host=hypervisor.name,
+        availability_zone=host_zones.get(service_host),
+        status=hypervisor.status,
+        state=hypervisor.state,
+        **fields,
+    )
+
+
+def _zone_capacities(hosts: List[HostCapacity]) -> List[ZoneCapacity]:
+    """Sum schedulable host capacities per zone, listing hosts outside any zone last."""
+    zones: Dict[Optional[str], ZoneCapacity] = {}
+    for host in hosts:
+        name = host.availability_zone
+        zone = zones.setdefault(name, ZoneCapacity(name=name))
+        zone.hosts += 1
+        if not _host_schedulable(host):
+            continue
+
+        zone.schedulable_hosts += 1
+        for field in Capacity.model_fields:
+            setattr(zone, field, getattr(zone, field) + getattr(host, field))
+
+    return sorted(zones.values(), key=lambda zone: (zone.name is None, zone.name or ""))
+
+
+def _host_schedulable(host: HostCapacity) -> bool:
+    """Whether the scheduler can place instances on a host."""
+    return host.status != "disabled" and host.state != "down"
+
+
+def _host_fits(host: HostCapacity, vcpus: int, ram_mb: int, disk_gb: int) -> int:
+    """Count instances of the given size that fit into the free resources of a host."""
+    if not _host_schedulable(host):
+        return 0
+
+    fits = []
+    for prefix, size in (("vcpus", vcpus), ("ram_mb", ram_mb), ("disk_gb", disk_gb)):
+        if size <= 0:
+            continue
+        max_unit = getattr(host, f"{prefix}_max_unit")
+        if max_unit is not None and size > max_unit:
+            return 0
+        fits.append(getattr(host, f"{prefix}_free") // size)
+
+    return min(fits) if fits else 0
+
+
+def _flavor_fit(
+    flavor,
+    hosts: List[HostCapacity],
+    quotas: Optional[List[QuotaUsage]],
+) -> FlavorFit:
+    """Precompute how many instances of a flavor fit per zone and within the project quota."""
+    vcpus = flavor.vcpus or 0
+    ram_mb = flavor.ram or 0
+    disk_gb = flavor.disk or 0
+    ephemeral_gb = flavor.ephemeral or 0
+    swap_mb = flavor.swap or 0
+    # Nova claims root, ephemeral and swap (rounded up to GiB) as DISK_GB. Volume-backed
+    # servers do not claim the root disk, so their fit count is a lower bound.
+    local_disk_gb = disk_gb + ephemeral_gb + (swap_mb + 1023) // 1024
+
+    fits_total = 0
+    fits_by_zone: Dict[str, int] = {}
+    for host in hosts:
+        fits = _host_fits(host, vcpus, ram_mb, local_disk_gb)
+        fits_total += fits
+        name = host.availability_zone
+        if name is not None:
+            fits_by_zone[name] = fits_by_zone.get(name, 0) + fits
+
+    free = {quota.resource: quota.free for quota in quotas or []}
+    allowed = []
+    for resource, size in (("instances", 1), ("cores", vcpus), ("ram", ram_mb)):
+        if free.get(resource) is not None and size > 0:
+            allowed.append(max(free[resource], 0) // size)
+
+    return FlavorFit(
+        id=flavor.id,
+        name=flavor.name,
+        vcpus=vcpus,
+        ram_mb=ram_mb,
+        disk_gb=disk_gb,
+        ephemeral_gb=ephemeral_gb,
+        swap_mb=swap_mb,
+        fits_total=fits_total,
+        fits_by_zone=fits_by_zone,
+        quota_allows=min(allowed) if allowed else None,
+    )
+
+
+def _quota_usage(absolute) -> List[QuotaUsage]:
+    """Convert absolute compute limits into quota usage; a negative limit means unlimited."""
+    quotas = []
+    for resource, limit, in_use in (
+        ("instances", absolute.instances, absolute.instances_used),
+        ("cores", absolute.total_cores, absolute.total_cores_used),
+        ("ram", absolute.total_ram, absolute.total_ram_used),
+        ("server_groups", absolute.server_groups, absolute.server_groups_used),
+    ):
+        in_use = in_use or 0
+        if limit is None or limit < 0:
+            quotas.append(QuotaUsage(resource=resource, in_use=in_use))
+        else:
+            free = limit - in_use
+            quotas.append(QuotaUsage(resource=resource, limit=limit, in_use=in_use, free=free))
+
+    return quotas
+
+
+def _flavor_fit_in_zone(fit: FlavorFit, availability_zone: str) -> FlavorFit:
+    """Narrow a flavor fit to a single availability zone."""
+    fits = fit.fits_by_zone.get(availability_zone, 0)
+    return fit.model_copy(update={"fits_total": fits, "fits_by_zone": {availability_zone: fits}})
+
+
+@mcp.tool()
+def capacity_summary(
+    flavor: Optional[str] = None,
+    availability_zone: Optional[str] = None,
+) -> CapacitySummary:
+    """Get free vCPU/RAM/disk per zone and host, and how many instances of each flavor fit.
+
+    Capacity is what the scheduler can place: Placement totals minus reserved, times the
+    allocation ratio. Results are served from a snapshot refreshed in the background.
+    Optionally narrow the result to a flavor (id or name) and/or an availability zone.
+    """
+    if not conn:
+        raise Exception("OpenStack connection not initialized")
+
+    try:
+        summary = _get_capacity_snapshot()
+
+        zones = summary.zones
+        hosts = summary.hosts
+        flavors = summary.flavors
+        if availability_zone:
+            if availability_zone not in {zone.name for zone in zones}:
+                raise Exception(f"Availability zone ({availability_zone}) not found")
+            zones = [zone for zone in zones if zone.name == availability_zone]
+            hosts = [host for host in hosts if host.availability_zone == availability_zone]
+            flavors = [_flavor_fit_in_zone(fit, availability_zone) for fit in flavors]
+        if flavor:
+            flavors = [fit for fit in flavors if flavor in (fit.id, fit.name)]
+            if not flavors:
+                raise Exception(f"Flavor ({flavor}) not found")
+
+        return summary.model_copy(update={"zones": zones, "hosts": hosts, "flavors": flavors})
+    except Exception as e:
+        logger.error(f"Failed to get capacity summary: {e}")
+        raise
+
+
+@mcp.tool()
+def quota_usage() -> QuotaUsageList:
+    """Get compute quota limits, usage and headroom of the current project."""
+    if not conn:
+        raise Exception("OpenStack connection not initialized")
+
+    try:
+        limits = conn.compute.get_limits()
+        return QuotaUsageList(
+            quotas=_quota_usage(limits.absolute),
+            refreshed_at=datetime.now(timezone.utc).isoformat(),
+        )
+    except Exception as e:
+        logger.error(f"Failed to get quota usage: {e}")
+        raise
@@ -3,7 +3,18 @@ from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 import server
-from server import OpenStackMCPServer, Server, ServerList, get_server, list_servers
+from openstack import exceptions
+from server import (
+    CapacitySummary,
+    OpenStackMCPServer,
+    QuotaUsageList,
+    Server,
+    ServerList,
+    capacity_summary,
+    get_server,
+    list_servers,
+    quota_usage,
+)
 
 
 class TestServerModel:
@@ -77,8 +88,9 @@ class TestOpenStackMCPServer:
         assert server.project_name == "demo"
         assert server.region == "RegionOne"
 
+    @patch("server.stop_capacity_refresh")
     @patch("server.connection.Connection")
-    def test_connect_success(self, mock_connection: MagicMock) -> None:
+    def test_connect_success(self, mock_connection: MagicMock, mock_stop_refresh: MagicMock) -> None:
         mock_conn_instance = Mock()
         mock_connection.return_value = mock_conn_instance
 
@@ -106,6 +118,8 @@ class TestOpenStackMCPServer:
             },
         )
         assert server.conn == mock_conn_instance
+        # Capacity of the previous connection is dropped; the refresh starts on first use
+        mock_stop_refresh.assert_called_once()
 
     @patch("server.connection.Connection")
     def test_connect_failure(self, mock_connection: MagicMock) -> None:
@@ -284,3 +298,409 @@ class TestMCPToolFunctions:
             get_server("server1")
 
         assert str(exc_info.value) == "API Error"
+
+
+def make_hypervisor(hypervisor_id: str, name: str, host: str) -> Mock:
+    # Microversion 2.88 no longer returns resource fields on hypervisors
+    hypervisor = Mock()
+    hypervisor.id = hypervisor_id
+    hypervisor.name = name
+    hypervisor.service_details = {"host": host}
+    hypervisor.status = "enabled"
+    hypervisor.state = "up"
+    hypervisor.vcpus = None
+    hypervisor.vcpus_used = None
+    hypervisor.memory_size = None
+    hypervisor.memory_used = None
+    hypervisor.local_disk_size = None
+    hypervisor.local_disk_used = None
+    hypervisor.running_vms = None
+    return hypervisor
+
+
+def make_inventory(name: str, total: int, reserved: int, ratio: float, max_unit: int) -> Mock:
+    inventory = Mock()
+    inventory.resource_class = name
+    inventory.total = total
+    inventory.reserved = reserved
+    inventory.allocation_ratio = ratio
+    inventory.max_unit = max_unit
+    return inventory
+
+
+def make_zone(name: str, hosts: dict) -> Mock:
+    zone = Mock()
+    zone.name = name
+    zone.hosts = hosts
+    return zone
+
+
+COMPUTE_SERVICE = {"nova-compute": {"available": True, "active": True}}
+
+
+def make_capacity_conn() -> Mock:
+    mock_conn = Mock()
+
+    mock_conn.compute.hypervisors.return_value = [
+        make_hypervisor("rp-1", "compute1.example.com", "compute1"),
+        make_hypervisor("rp-2", "compute2.example.com", "compute2"),
+        make_hypervisor("rp-3", "compute3.example.com", "compute3"),
+    ]
+
+    inventories = {
+        # 16 pCPUs with 4.0 overcommit, 2 pCPUs reserved
+        "rp-1": [
+            make_inventory("VCPU", 16, 2, 4.0, 16),
+            make_inventory("MEMORY_MB", 32768, 512, 1.5, 32768),
+            make_inventory("DISK_GB", 500, 0, 1.0, 500),
+        ],
+        "rp-2": [
+            make_inventory("VCPU", 8, 0, 1.0, 8),
+            make_inventory("MEMORY_MB", 16384, 0, 1.0, 16384),
+            make_inventory("DISK_GB", 200, 0, 1.0, 200),
+        ],
+        # Too small for a single m1.large vCPU allocation
+        "rp-3": [
+            make_inventory("VCPU", 2, 0, 16.0, 2),
+            make_inventory("MEMORY_MB", 65536, 0, 1.0, 65536),
+            make_inventory("DISK_GB", 1000, 0, 1.0, 1000),
+        ],
+    }
+    usages = {
+        "rp-1": {"VCPU": 40, "MEMORY_MB": 16384, "DISK_GB": 100},
+        # Used more than schedulable after the allocation ratio was lowered
+        "rp-2": {"VCPU": 12, "MEMORY_MB": 16384, "DISK_GB": 200},
+        "rp-3": {},
+    }
+    placement = mock_conn.placement
+    placement.resource_provider_inventories.side_effect = inventories.get
+    placement.fetch_resource_provider_usages.side_effect = lambda rp: Mock(usages=usages[rp])
+
+    mock_conn.compute.availability_zones.return_value = [
+        make_zone("internal", {"controller": {"nova-conductor": {}, "nova-scheduler": {}}}),
+        make_zone("az1", {"compute1": COMPUTE_SERVICE, "compute2": COMPUTE_SERVICE}),
+        make_zone("az2", {"compute3": COMPUTE_SERVICE}),
+    ]
+
+    flavor = Mock()
+    flavor.id = "flavor-large"
+    flavor.name = "m1.large"
+    flavor.vcpus = 4
+    flavor.ram = 8192
+    flavor.disk = 80
+    flavor.ephemeral = 0
+    flavor.swap = 0
+    mock_conn.compute.flavors.return_value = [flavor]
+
+    absolute = Mock()
+    absolute.instances = 10
+    absolute.instances_used = 3
+    absolute.total_cores = 20
+    absolute.total_cores_used = 12
+    absolute.total_ram = -1
+    absolute.total_ram_used = 24576
+    absolute.server_groups = 10
+    absolute.server_groups_used = 0
+    mock_conn.compute.get_limits.return_value.absolute = absolute
+
+    return mock_conn
+
+
+class TestCapacityToolFunctions:
+    def setup_method(self) -> None:
+        server.stop_capacity_refresh()
+
+    def teardown_method(self) -> None:
+        server.stop_capacity_refresh()
+
+    def test_capacity_summary_no_connection(self) -> None:
+        server.conn = None
+
+        with pytest.raises(Exception) as exc_info:
+            capacity_summary()
+
+        assert str(exc_info.value) == "OpenStack connection not initialized"
+
+    def test_capacity_summary_success(self) -> None:
+        server.conn = make_capacity_conn()
+
+        result = capacity_summary()
+
+        assert isinstance(result, CapacitySummary)
+        server.conn.compute.hypervisors.assert_called_once_with(details=True)
+        server.conn.compute.availability_zones.assert_called_once_with(details=True)
+
+        # Test per-host rollups use Placement totals, reserved and allocation ratio
+        hosts = {host.host: host for host in result.hosts}
+        assert hosts["compute1.example.com"].availability_zone == "az1"
+        assert hosts["compute1.example.com"].vcpus_total == 56
+        assert hosts["compute1.example.com"].vcpus_used == 40
+        assert hosts["compute1.example.com"].vcpus_free == 16
+        assert hosts["compute1.example.com"].ram_mb_total == 48384
+        assert hosts["compute1.example.com"].ram_mb_free == 32000
+        assert hosts["compute1.example.com"].disk_gb_free == 400
+        # Test overcommitted host reports no headroom instead of negative values
+        assert hosts["compute2.example.com"].vcpus_free == 0
+        assert hosts["compute3.example.com"].vcpus_total == 32
+
+        # Test per-zone rollups
+        assert [zone.name for zone in result.zones] == ["az1", "az2"]
+        assert result.zones[0].hosts == 2
+        assert result.zones[0].schedulable_hosts == 2
+        assert result.zones[0].vcpus_total == 64
+        assert result.zones[0].vcpus_free == 16
+        assert result.zones[1].vcpus_free == 32
+
+        # Test flavor fits: compute1 fits 3 (RAM), compute2 is full, compute3 is below max_unit
+        assert len(result.flavors) == 1
+        assert result.flavors[0].name == "m1.large"
+        assert result.flavors[0].fits_by_zone == {"az1": 3, "az2": 0}
+        assert result.flavors[0].fits_total == 3
+        # Cores quota leaves room for 2 more, RAM quota is unlimited
+        assert result.flavors[0].quota_allows == 2
+
+    def test_capacity_summary_ignores_hypervisor_resource_fields(self) -> None:
+        server.conn = make_capacity_conn()
+
+        result = capacity_summary()
+
+        # Hypervisors return None for resources (microversion 2.88); capacity comes from Placement
+        assert all(host.vcpus_total > 0 for host in result.hosts)
+        server.conn.placement.resource_provider_inventories.assert_any_call("rp-1")
+        server.conn.placement.fetch_resource_provider_usages.assert_any_call("rp-1")
+
+    def test_capacity_summary_placement_error(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.placement.resource_provider_inventories.side_effect = Exception("Not found")
+
+        with pytest.raises(Exception) as exc_info:
+            capacity_summary()
+
+        assert str(exc_info.value) == "Not found"
+
+    def test_capacity_summary_without_quotas(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.compute.get_limits.side_effect = Exception("API Error")
+
+        result = capacity_summary()
+
+        assert result.quotas is None
+        assert result.flavors[0].fits_total == 3
+        assert result.flavors[0].quota_allows is None
+
+    def test_capacity_summary_local_disk_includes_ephemeral_and_swap(self) -> None:
+        server.conn = make_capacity_conn()
+        flavor = server.conn.compute.flavors.return_value[0]
+        flavor.disk = 100
+        flavor.ephemeral = 60
+        flavor.swap = 1536
+
+        result = capacity_summary()
+
+        # compute1 has 400GB free disk, each instance claims 100 + 60 + 2 GB
+        assert result.flavors[0].fits_by_zone == {"az1": 2, "az2": 0}
+        assert result.flavors[0].ephemeral_gb == 60
+        assert result.flavors[0].swap_mb == 1536
+
+    def test_capacity_summary_host_without_zone(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.compute.availability_zones.return_value[1].hosts = {"compute2": COMPUTE_SERVICE}
+
+        result = capacity_summary()
+
+        assert [zone.name for zone in result.zones] == ["az1", "az2", None]
+        assert result.flavors[0].fits_by_zone == {"az1": 0, "az2": 0}
+        assert result.flavors[0].fits_total == 3
+
+    def test_capacity_summary_all_in_one_host(self) -> None:
+        server.conn = make_capacity_conn()
+        hypervisor = make_hypervisor("rp-1", "devstack", "devstack")
+        server.conn.compute.hypervisors.return_value = [hypervisor]
+        controller = {"nova-conductor": {}, "nova-scheduler": {}}
+        # The compute host is also listed under the internal zone, in either order
+        server.conn.compute.availability_zones.return_value = [
+            make_zone("nova", {"devstack": COMPUTE_SERVICE}),
+            make_zone("internal", {"devstack": controller}),
+        ]
+
+        result = capacity_summary()
+
+        assert result.hosts[0].availability_zone == "nova"
+        assert [zone.name for zone in result.zones] == ["nova"]
+        assert result.flavors[0].fits_by_zone == {"nova": 3}
+
+        with pytest.raises(Exception) as exc_info:
+            capacity_summary(availability_zone="internal")
+
+        assert str(exc_info.value) == "Availability zone (internal) not found"
+
+    def test_capacity_summary_zone_excludes_unschedulable_hosts(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.compute.hypervisors.return_value[0].status = "disabled"
+
+        result = capacity_summary()
+
+        assert result.zones[0].hosts == 2
+        assert result.zones[0].schedulable_hosts == 1
+        # Only compute2, which has no free vCPUs, is counted
+        assert result.zones[0].vcpus_total == 8
+        assert result.zones[0].vcpus_free == 0
+        assert result.flavors[0].fits_by_zone == {"az1": 0, "az2": 0}
+
+    def test_capacity_summary_filtered(self) -> None:
+        server.conn = make_capacity_conn()
+
+        result = capacity_summary(flavor="m1.large", availability_zone="az1")
+
+        assert [zone.name for zone in result.zones] == ["az1"]
+        assert [host.host for host in result.hosts] == [
+            "compute1.example.com",
+            "compute2.example.com",
+        ]
+        assert result.flavors[0].fits_by_zone == {"az1": 3}
+        assert result.flavors[0].fits_total == 3
+
+    def test_capacity_summary_flavor_not_found(self) -> None:
+        server.conn = make_capacity_conn()
+
+        with pytest.raises(Exception) as exc_info:
+            capacity_summary(flavor="m1.huge")
+
+        assert str(exc_info.value) == "Flavor (m1.huge) not found"
+
+    def test_capacity_summary_availability_zone_not_found(self) -> None:
+        server.conn = make_capacity_conn()
+
+        with pytest.raises(Exception) as exc_info:
+            capacity_summary(availability_zone="az9")
+
+        assert str(exc_info.value) == "Availability zone (az9) not found"
+
+    @patch("server.threading.Timer")
+    def test_capacity_summary_is_cached(self, mock_timer: MagicMock) -> None:
+        server.conn = make_capacity_conn()
+
+        capacity_summary()
+        capacity_summary()
+
+        server.conn.compute.hypervisors.assert_called_once()
+        # The background refresh starts with the first call
+        args = (server._capacity_generation, 0)
+        interval = server.CAPACITY_REFRESH_INTERVAL
+        mock_timer.assert_called_once_with(interval, server._run_capacity_refresh, args=args)
+        assert mock_timer.return_value.daemon is True
+        mock_timer.return_value.start.assert_called_once()
+
+    def test_capacity_summary_api_error(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.compute.hypervisors.side_effect = Exception("API Error")
+
+        with pytest.raises(Exception) as exc_info:
+            capacity_summary()
+
+        assert str(exc_info.value) == "API Error"
+        assert server._capacity_timer is None
+
+    @patch("server.threading.Timer")
+    def test_run_capacity_refresh_swaps_snapshot(self, mock_timer: MagicMock) -> None:
+        server.conn = make_capacity_conn()
+        capacity_summary()
+        first = server._capacity_cache
+
+        server._run_capacity_refresh(server._capacity_generation, 0)
+
+        assert server.conn.compute.hypervisors.call_count == 2
+        assert server._capacity_cache is not first
+        assert mock_timer.call_count == 2
+
+    @patch("server.threading.Timer")
+    def test_run_capacity_refresh_backs_off_on_failure(self, mock_timer: MagicMock) -> None:
+        server.conn = make_capacity_conn()
+        capacity_summary()
+        first = server._capacity_cache
+        server.conn.compute.hypervisors.side_effect = Exception("API Error")
+
+        server._run_capacity_refresh(server._capacity_generation, 1)
+
+        assert server._capacity_cache is first
+        delay = mock_timer.call_args.args[0]
+        assert delay == server.CAPACITY_REFRESH_INTERVAL * 4
+
+    @patch("server.threading.Timer")
+    def test_run_capacity_refresh_stops_on_permission_error(self, mock_timer: MagicMock) -> None:
+        server.conn = make_capacity_conn()
+        capacity_summary()
+        server.conn.compute.hypervisors.side_effect = exceptions.ForbiddenException("Policy denied")
+
+        server._run_capacity_refresh(server._capacity_generation, 0)
+
+        assert server._capacity_cache is None
+        assert server._capacity_timer is None
+        mock_timer.assert_called_once()
+
+    @patch("server.threading.Timer")
+    def test_run_capacity_refresh_stops_after_restart(self, mock_timer: MagicMock) -> None:
+        server.conn = make_capacity_conn()
+        generation = server._capacity_generation
+        server.stop_capacity_refresh()
+
+        server._run_capacity_refresh(generation, 0)
+
+        assert server._capacity_cache is None
+        mock_timer.assert_not_called()
+
+    def test_refresh_capacity_cache_discards_snapshot_after_stop(self) -> None:
+        server.conn = make_capacity_conn()
+        hypervisors = server.conn.compute.hypervisors.return_value
+
+        def stop_during_build(details: bool) -> Any:
+            server.stop_capacity_refresh()
+            return hypervisors
+
+        server.conn.compute.hypervisors.side_effect = stop_during_build
+
+        server._refresh_capacity_cache(server._capacity_generation)
+
+        assert server._capacity_cache is None
+
+    def test_quota_usage_no_connection(self) -> None:
+        server.conn = None
+
+        with pytest.raises(Exception) as exc_info:
+            quota_usage()
+
+        assert str(exc_info.value) == "OpenStack connection not initialized"
+
+    def test_quota_usage_success(self) -> None:
+        server.conn = make_capacity_conn()
+
+        result = quota_usage()
+
+        assert isinstance(result, QuotaUsageList)
+        quotas = {quota.resource: quota for quota in result.quotas}
+        assert quotas["instances"].limit == 10
+        assert quotas["instances"].in_use == 3
+        assert quotas["instances"].free == 7
+        assert quotas["cores"].free == 8
+        # Unlimited quota has no limit and no headroom
+        assert quotas["ram"].limit is None
+        assert quotas["ram"].in_use == 24576
+        assert quotas["ram"].free is None
+
+    def test_quota_usage_without_admin_access(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.compute.hypervisors.side_effect = exceptions.ForbiddenException("Policy denied")
+
+        result = quota_usage()
+
+        assert len(result.quotas) == 4
+        server.conn.compute.hypervisors.assert_not_called()
+
+    def test_quota_usage_api_error(self) -> None:
+        server.conn = make_capacity_conn()
+        server.conn.compute.get_limits.side_effect = Exception("API Error")
+
+        with pytest.raises(Exception) as exc_info:
+            quota_usage()
+
+        assert str(exc_info.value) == "API Error"